@@ -1,11 +1,15 @@
 from ErisPulse import sdk
 import os
 import asyncio
-import aiofiles
 import shlex
+import time
 from typing import Optional, List, Dict, Any
 from fastapi import UploadFile, File, Depends, HTTPException, Header, Request
 from .video_converter import VideoConverter
+from .broadcast import FrameBroadcaster
+from .profiler import PlaybackProfiler
+from .library import VideoLibrary
+from .frame_store import frame_store_path, write_frame_store
 from collections import defaultdict
 from datetime import datetime, timedelta
 
@@ -24,11 +28,21 @@ class Main:
         if not os.path.exists(self.video_dir):
             os.makedirs(self.video_dir)
 
+        # 内容寻址的视频库
+        # blob 被删除时一并删除其帧存储
+        self.library = VideoLibrary(self.video_dir, on_remove=self._remove_frame_store)
+        damaged = self.library.verify()
+        if damaged:
+            self.logger.warning(f"视频库中有 {len(damaged)} 个文件缺失或大小不符: {', '.join(damaged)}")
+
         # 注册模块路由
         self._register_routes()
 
         # 存储活跃会话
         self.active_sessions = {}
+
+        # 正在生成的帧存储
+        self.building_frame_stores = set()
         
         # IP上传限制相关属性
         self.ip_upload_limits = defaultdict(list)  # 存储IP上传记录
@@ -47,7 +61,19 @@ class Main:
                 "braille_height": 30,               # 默认 braille 高度
                 "max_file_size_mb": 50,             # 默认文件上传限制
                 "max_concurrent_uploads_per_ip": 3, # 同一IP最大并发上传数
-                "max_frame_rate": 10                # 最大帧率
+                "max_frame_rate": 10,               # 最大帧率
+                "decoder_backend": "opencv",        # 解码后端（opencv / ffmpeg）
+                "batch_window": 0.5,                # 合并同一视频播放请求的等待时间（秒）
+                "frame_selection": "uniform",       # 抽帧方式（uniform / scene）
+                "scene_threshold": 30,              # 场景切换判定阈值（平均像素差 0-255）
+                "frame_store_enabled": False,       # 是否使用预解码的帧存储播放
+                "frame_store_width": 100,           # 帧存储宽度（像素）
+                "frame_store_height": 50,           # 帧存储高度（像素）
+                "frame_store_fps": 0,               # 帧存储帧率，0 表示保留全部源帧
+                "frame_store_packed": False,        # 是否以 1 位点阵存储
+                "profile_playback": False,          # 是否记录所有播放会话的分阶段耗时
+                "profile_buffer_size": 1024,        # 每个阶段保留的耗时样本数
+                "profile_dump_dir": ""              # cProfile 输出目录，留空则不输出
             }
             self.sdk.config.setConfig("EditVideoPlayer", config)
             self.logger.warning("已创建默认配置，请在 config.toml 中修改 EditVideoPlayer 配置")
@@ -58,6 +84,22 @@ class Main:
         self.braille_width = config.get("braille_width", 60)
         self.braille_height = config.get("braille_height", 30)
         self.max_frame_rate = config.get("max_frame_rate", 10)
+        self.decoder_backend = config.get("decoder_backend", "opencv")
+        self.batch_window = config.get("batch_window", 0.5)
+        self.frame_selection = config.get("frame_selection", "uniform")
+        self.scene_threshold = config.get("scene_threshold", 30)
+
+        # 帧存储配置
+        self.frame_store_enabled = config.get("frame_store_enabled", False)
+        self.frame_store_width = config.get("frame_store_width", 100)
+        self.frame_store_height = config.get("frame_store_height", 50)
+        self.frame_store_fps = config.get("frame_store_fps", 0)
+        self.frame_store_packed = config.get("frame_store_packed", False)
+
+        # 性能分析配置
+        self.profile_playback = config.get("profile_playback", False)
+        self.profile_buffer_size = config.get("profile_buffer_size", 1024)
+        self.profile_dump_dir = config.get("profile_dump_dir", "")
         
         # 文件上传限制配置
         self.max_file_size = config.get("max_file_size_mb", 50) * 1024 * 1024
@@ -66,6 +108,12 @@ class Main:
         # 更新视频转换器的尺寸配置
         self.converter.width = self.braille_width
         self.converter.height = self.braille_height
+        self.converter.decoder = self.decoder_backend
+        self.converter.frame_selection = self.frame_selection
+        self.converter.scene_threshold = self.scene_threshold
+
+        # 相同视频的播放请求共享一次解码
+        self.broadcaster = FrameBroadcaster(self.converter, self.batch_window)
 
     @staticmethod
     def should_eager_load() -> bool:
@@ -151,18 +199,7 @@ class Main:
         
         :return: 视频信息列表
         """
-        videos = []
-        if os.path.exists(self.video_dir):
-            for file in os.listdir(self.video_dir):
-                if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                    file_path = os.path.join(self.video_dir, file)
-                    stat = os.stat(file_path)
-                    videos.append({
-                        "filename": file,
-                        "size": stat.st_size,
-                        "modified": stat.st_mtime
-                    })
-        return videos
+        return self.library.list_videos()
 
     def _get_video_by_index(self, index: int) -> Optional[str]:
         """
@@ -239,18 +276,30 @@ class Main:
                 self._add_ip_upload_record(client_ip)
                 
                 try:
-                    file_path = os.path.join(self.video_dir, file.filename)
-
-                    # 保存文件
-                    async with aiofiles.open(file_path, 'wb') as out_file:
-                        content = await file.read()
-                        await out_file.write(content)
+                    filename = os.path.basename(file.filename or "")
+                    if not filename or filename.startswith("."):
+                        return {
+                            "status": "error",
+                            "message": "无效的文件名"
+                        }
+
+                    # 边接收边计算哈希，重复内容只保留一份
+                    content_hash, duplicate = await self.library.store(filename, file.read, self.max_file_size)
+
+                    if duplicate:
+                        self.logger.info(f"视频文件 {filename} 与已有内容重复，已作为别名保存 (IP: {client_ip})")
+                    else:
+                        self.logger.info(f"视频文件已上传: {filename} (IP: {client_ip})")
 
-                    self.logger.info(f"视频文件已上传: {file.filename} (IP: {client_ip})")
+                    if self.frame_store_enabled:
+                        asyncio.create_task(self._build_frame_store(self.library.blob_path(content_hash),
+                                                                    content_hash))
                     return {
                         "status": "success",
-                        "message": f"视频 {file.filename} 上传成功",
-                        "filename": file.filename
+                        "message": f"视频 {filename} 上传成功",
+                        "filename": filename,
+                        "hash": content_hash,
+                        "duplicate": duplicate
                     }
                 finally:
                     # 移除上传记录
@@ -323,8 +372,8 @@ class Main:
                     }
 
                 # 检查视频文件是否存在
-                video_path = os.path.join(self.video_dir, video_name)
-                if not os.path.exists(video_path):
+                video_path = self.library.resolve(video_name)
+                if not video_path:
                     self.logger.warning(f"视频文件 {video_name} 不存在 (IP: {client_ip})")
                     return {
                         "status": "error",
@@ -332,7 +381,8 @@ class Main:
                     }
 
                 self.logger.info(f"开始播放视频 {video_name} 在 {platform} 平台 (尺寸: {width}x{height})")
-                asyncio.create_task(self._play_video_task(video_path, platform, target_type, target_id, width, height))
+                asyncio.create_task(self._play_video_task(video_path, platform, target_type, target_id, width, height,
+                                                          video_name=video_name))
 
                 size_info = f" ({width}x{height})" if width and height else ""
                 return {
@@ -367,6 +417,13 @@ class Main:
             methods=["POST"]
         )
 
+        # 保留处理函数引用，便于在本地直接调用（如压测）
+        self.http_handlers = {
+            "/upload": upload_video,
+            "/list": list_videos,
+            "/play": play_video
+        }
+
         @self.sdk.adapter.on("message")
         async def handle_command(data):
             """
@@ -404,7 +461,7 @@ class Main:
                                       "可用命令:\n"
                                       "  list - 列出所有可用视频（带序号）\n"
                                       "  stop - 停止当前播放\n"
-                                      "  play <文件名或序号> [宽度] [高度] - 播放指定视频\n"
+                                      "  play <文件名或序号> [宽度] [高度] [--profile] - 播放指定视频\n"
                                       "提示：可以使用 /video list 查看视频列表和对应序号")
                 return
 
@@ -423,7 +480,7 @@ class Main:
                                       "可用命令:\n"
                                       "  list - 列出所有可用视频（带序号）\n"
                                       "  stop - 停止当前播放\n"
-                                      "  play <文件名或序号> [宽度] [高度] - 播放指定视频\n"
+                                      "  play <文件名或序号> [宽度] [高度] [--profile] - 播放指定视频\n"
                                       "提示：可以使用 /video list 查看视频列表和对应序号")
                 return
 
@@ -445,10 +502,14 @@ class Main:
                                           "没有找到可用视频")
 
             elif command == "play":
+                # 分离 --profile 选项，其余按位置参数解析
+                profile = "--profile" in parts
+                parts = [part for part in parts if part != "--profile"]
+
                 if len(parts) < 3:
                     self.logger.info(f"用户 {user_id} 请求播放视频但未提供文件名或序号")
                     await self.send_message(platform, target_type, target_id, 
-                                          "用法: /video play <文件名或序号> [宽度] [高度]\n"
+                                          "用法: /video play <文件名或序号> [宽度] [高度] [--profile]\n"
                                           "提示：文件名如果有空格，需要用引号包裹")
                     return
 
@@ -469,8 +530,8 @@ class Main:
                     # 不是数字，作为文件名处理
                     video_name = video_identifier
                     # 检查文件是否存在
-                    video_path = os.path.join(self.video_dir, video_name)
-                    if not os.path.exists(video_path):
+                    video_path = self.library.resolve(video_name)
+                    if not video_path:
                         self.logger.warning(f"视频文件 {video_name} 不存在，用户 {user_id} 尝试播放")
                         await self.send_message(platform, target_type, target_id, 
                                               f"视频文件 {video_name} 不存在")
@@ -497,8 +558,8 @@ class Main:
                                           f"平台 {platform} 不支持消息编辑功能")
                     return
 
-                video_path = os.path.join(self.video_dir, video_name)
-                if not os.path.exists(video_path):
+                video_path = self.library.resolve(video_name)
+                if not video_path:
                     self.logger.warning(f"视频文件 {video_name} 不存在，用户 {user_id} 尝试播放")
                     await self.send_message(platform, target_type, target_id, 
                                           f"视频文件 {video_name} 不存在")
@@ -506,7 +567,8 @@ class Main:
 
                 self.logger.info(f"用户 {user_id} 开始播放视频: {video_name} (尺寸: {width}x{height})")
                 # 传递宽度和高度参数
-                asyncio.create_task(self._play_video_task(video_path, platform, target_type, target_id, width, height))
+                asyncio.create_task(self._play_video_task(video_path, platform, target_type, target_id,
+                                                          width, height, profile, video_name))
                 size_info = f" ({width}x{height})" if width and height else ""
                 await self.send_message(platform, target_type, target_id, 
                                       f"开始播放视频: {video_name}{size_info}")
@@ -535,7 +597,7 @@ class Main:
                                       "未知命令。可用命令:\n"
                                       "  list - 列出所有可用视频（带序号）\n"
                                       "  stop - 停止当前播放\n"
-                                      "  play <文件名或序号> [宽度] [高度] - 播放指定视频")
+                                      "  play <文件名或序号> [宽度] [高度] [--profile] - 播放指定视频")
 
         except Exception as e:
             self.logger.error(f"处理视频命令失败: {str(e)}", exc_info=True)
@@ -543,7 +605,8 @@ class Main:
                                   f"处理命令时出错: {str(e)}")
 
     async def _play_video_task(self, video_path: str, platform: str, target_type: str, target_id: str, 
-                               width: int = None, height: int = None):
+                               width: int = None, height: int = None, profile: bool = False,
+                               video_name: str = None):
         """
         视频播放任务
         
@@ -553,10 +616,13 @@ class Main:
         :param target_id: 目标ID
         :param width: 播放宽度
         :param height: 播放高度
+        :param profile: 是否记录并回报本次播放的分阶段耗时
+        :param video_name: 视频显示名，默认为文件名
         """
         session_key = f"{platform}_{target_type}_{target_id}"
         user_info = f"用户 {target_id}" if target_type == "user" else f"群组 {target_id}"
-        video_name = os.path.basename(video_path)
+        video_name = video_name or os.path.basename(video_path)
+        profiler = self._create_profiler(session_key) if profile or self.profile_playback else None
         
         try:
             adapter = self.sdk.adapter.get(platform)
@@ -596,17 +662,11 @@ class Main:
                 self.active_sessions[session_key] = set()
             self.active_sessions[session_key].add(current_task)
 
-            # 保存原始尺寸设置
-            original_width = self.converter.width
-            original_height = self.converter.height
-            
-            # 如果用户指定了尺寸，则临时修改
-            if width and height:
-                self.converter.width = width
-                self.converter.height = height
+            # 有预解码的帧存储时直接读取，跳过解码
+            video_path = await self._get_frame_store(video_path) or video_path
 
-            # 获取视频帧率
-            video_fps, _a, _b = self.converter.get_video_info(video_path)
+            # 获取视频帧率，探测可能启动 ffprobe 子进程，放到线程中执行
+            video_fps, _a, _b = await asyncio.to_thread(self.converter.get_video_info, video_path)
             self.logger.info(f"视频 {video_name} 的帧率为 {video_fps} FPS")
             
             # 计算发送帧间隔
@@ -619,29 +679,41 @@ class Main:
             frame_count = 0
             last_frame_content = None  # 记录上一帧内容
             
-            async for frame in self.converter.convert_video_to_braille(video_path):
-                try:
-                    # 只有当帧内容不同时才发送
-                    if frame != last_frame_content:
-                        adapter.Send.To(target_type, target_id).Edit(msg_id, frame)
-                        last_frame_content = frame
-                        frame_count += 1
-                        # 每播放10帧记录一次日志
-                        if frame_count % 10 == 0:
-                            self.logger.debug(f"视频 {video_name} 已播放 {frame_count} 帧")
-                    else:
-                        self.logger.debug(f"跳过发送重复帧 {frame_count}")
-                    
-                    # 控制播放速度
-                    await asyncio.sleep(sleep_time)
-                except Exception as e:
-                    self.logger.error(f"编辑消息失败: {str(e)} (视频: {video_name})", exc_info=True)
-                    break
-
-            # 恢复原始尺寸设置
-            if width and height:
-                self.converter.width = original_width
-                self.converter.height = original_height
+            # 抽帧由解码后端按发送帧率完成，同一视频的其他会话共享解码
+            # 性能分析时单独解码，使各阶段耗时只归属于本会话
+            size = (width or self.braille_width, height or self.braille_height)
+            if profiler is None:
+                frames = self.broadcaster.subscribe(video_path, size, send_fps, video_fps)
+            else:
+                profiler.start()
+                frames = self.converter.convert_video_to_braille(video_path, size[0], size[1], send_fps,
+                                                                 profiler, video_fps)
+            try:
+                async for frame in frames:
+                    try:
+                        # 只有当帧内容不同时才发送
+                        if frame != last_frame_content:
+                            if profiler is not None:
+                                started = time.perf_counter_ns()
+                            result = adapter.Send.To(target_type, target_id).Edit(msg_id, frame)
+                            if profiler is not None:
+                                # 编辑以 Task 形式异步完成，在完成时计时
+                                profiler.track_edit(result, started)
+                            last_frame_content = frame
+                            frame_count += 1
+                            # 每播放10帧记录一次日志
+                            if frame_count % 10 == 0:
+                                self.logger.debug(f"视频 {video_name} 已播放 {frame_count} 帧")
+                        else:
+                            self.logger.debug(f"跳过发送重复帧 {frame_count}")
+
+                        # 控制播放速度
+                        await asyncio.sleep(sleep_time)
+                    except Exception as e:
+                        self.logger.error(f"编辑消息失败: {str(e)} (视频: {video_name})", exc_info=True)
+                        break
+            finally:
+                await frames.aclose()
 
             # 发送结束消息
             adapter.Send.To(target_type, target_id).Edit(msg_id, "视频播放结束")
@@ -666,6 +738,107 @@ class Main:
                 self.active_sessions[session_key].remove(current_task)
                 if not self.active_sessions[session_key]:
                     del self.active_sessions[session_key]
+        finally:
+            if profiler is not None:
+                await self._report_profile(profiler, platform, target_type, target_id, video_name, profile)
+
+    async def _get_frame_store(self, video_path: str) -> Optional[str]:
+        """
+        获取视频对应的帧存储
+
+        直接放入目录的视频首次播放时需要计算整个文件的哈希，在后台线程中进行。
+
+        :param video_path: 视频文件路径
+        :return: 帧存储文件路径，未启用或不存在时返回 None
+        """
+        if not self.frame_store_enabled:
+            return None
+        try:
+            store_path = frame_store_path(self.video_dir, await self.library.content_hash_async(video_path))
+        except Exception as e:
+            self.logger.warning(f"计算视频内容哈希失败: {str(e)}")
+            return None
+        return store_path if os.path.exists(store_path) else None
+
+    async def _build_frame_store(self, video_path: str, content_hash: str):
+        """
+        在后台线程中为视频生成帧存储
+
+        :param video_path: 视频文件路径
+        :param content_hash: 视频内容哈希
+        """
+        store_path = frame_store_path(self.video_dir, content_hash)
+        if os.path.exists(store_path) or store_path in self.building_frame_stores:
+            return
+        self.building_frame_stores.add(store_path)
+        try:
+            count = await asyncio.to_thread(
+                write_frame_store, self.converter, video_path, store_path,
+                self.frame_store_width, self.frame_store_height,
+                self.frame_store_fps or None, self.frame_store_packed
+            )
+            self.logger.info(f"已生成帧存储 {store_path}，共 {count} 帧")
+            # 生成期间视频已被替换时删除刚生成的帧存储
+            if content_hash not in self.library.index["blobs"]:
+                self._remove_frame_store(content_hash)
+        except Exception as e:
+            self.logger.error(f"生成帧存储失败: {str(e)} (视频: {video_path})")
+        finally:
+            self.building_frame_stores.discard(store_path)
+
+    def _remove_frame_store(self, content_hash: str):
+        """
+        删除视频内容对应的帧存储
+
+        :param content_hash: 视频内容哈希
+        """
+        store_path = frame_store_path(self.video_dir, content_hash)
+        try:
+            if os.path.exists(store_path):
+                os.remove(store_path)
+                self.logger.info(f"已删除帧存储 {store_path}")
+        except Exception as e:
+            self.logger.warning(f"删除帧存储失败: {str(e)} (路径: {store_path})")
+
+    def _create_profiler(self, session_key: str) -> PlaybackProfiler:
+        """
+        创建播放会话的性能分析器
+
+        :param session_key: 会话键
+        :return: 性能分析器
+        """
+        cprofile_path = None
+        if self.profile_dump_dir:
+            os.makedirs(self.profile_dump_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            cprofile_path = os.path.join(self.profile_dump_dir, f"{session_key}_{timestamp}.pstats")
+        return PlaybackProfiler(self.profile_buffer_size, cprofile_path)
+
+    async def _report_profile(self, profiler: PlaybackProfiler, platform: str, target_type: str, target_id: str,
+                              video_name: str, send: bool):
+        """
+        输出播放会话的性能分析结果
+
+        :param profiler: 性能分析器
+        :param platform: 平台名称
+        :param target_type: 目标类型
+        :param target_id: 目标ID
+        :param video_name: 视频文件名
+        :param send: 是否将报告发送到会话
+        """
+        try:
+            dump_path = profiler.stop()
+            await profiler.wait_pending()
+            report = profiler.format_report()
+            if dump_path:
+                report += f"\ncProfile 数据已保存: {dump_path}"
+            elif profiler.cprofile_skipped:
+                report += "\n其他会话正在使用 cProfile，本次未保存 cProfile 数据"
+            self.logger.info(f"视频 {video_name} 播放性能分析:\n{report}")
+            if send:
+                self.sdk.adapter.get(platform).Send.To(target_type, target_id).Text(report)
+        except Exception as e:
+            self.logger.error(f"输出性能分析结果失败: {str(e)}")
 
     async def send_message(self, platform: str, target_type: str, target_id: str, message: str):
         """
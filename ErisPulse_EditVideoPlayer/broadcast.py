@@ -0,0 +1,175 @@
+import os
+import asyncio
+from collections import defaultdict
+from typing import AsyncGenerator, Dict, Optional, Set, Tuple
+
+from .video_converter import VideoConverter
+
+Size = Tuple[int, int]
+
+
+class _StreamEnd:
+    """
+    帧流结束标记
+    """
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+class FrameBroadcast:
+    """
+    单个视频的多尺寸帧广播
+
+    一次解码同时渲染所有订阅的尺寸，并分发到各尺寸订阅者的队列中。
+    队列有界，最慢的订阅者决定解码节奏。
+    """
+
+    def __init__(self, converter: VideoConverter, video_path: str, fps: Optional[float],
+                 queue_size: int = 2, source_fps: Optional[float] = None):
+        self.converter = converter
+        self.video_path = video_path
+        self.fps = fps
+        self.source_fps = source_fps
+        self.queue_size = queue_size
+        self.subscribers: Dict[Size, Set[asyncio.Queue]] = defaultdict(set)
+        self.started = False
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, size: Size) -> asyncio.Queue:
+        """
+        订阅指定尺寸的帧
+
+        :param size: 画布尺寸 (宽度, 高度)
+        :return: 接收帧的队列
+        """
+        if self.started:
+            raise Exception("广播已开始，无法再订阅")
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers[size].add(queue)
+        return queue
+
+    def unsubscribe(self, size: Size, queue: asyncio.Queue):
+        """
+        取消订阅
+
+        :param size: 画布尺寸
+        :param queue: 订阅时返回的队列
+        """
+        queues = self.subscribers.get(size)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[size]
+
+        # 清空队列，避免解码任务阻塞在已离开的订阅者上
+        while not queue.empty():
+            queue.get_nowait()
+
+        if not self.subscribers and self._task and not self._task.done():
+            self._task.cancel()
+
+    def start(self):
+        """
+        开始解码并分发
+        """
+        if self.started:
+            return
+        self.started = True
+        if self.subscribers:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        frames = self.converter.convert_video_to_braille_multi(
+            self.video_path, list(self.subscribers), self.fps, source_fps=self.source_fps
+        )
+        finished = False
+        error = None
+        try:
+            async for rendered in frames:
+                if not self.subscribers:
+                    break
+                for size, queues in list(self.subscribers.items()):
+                    frame = rendered[size]
+                    for queue in list(queues):
+                        await queue.put(frame)
+            finished = True
+            for queues in list(self.subscribers.values()):
+                for queue in list(queues):
+                    await queue.put(_StreamEnd())
+        except Exception as e:
+            error = e
+        finally:
+            await frames.aclose()
+            if not finished:
+                for queues in list(self.subscribers.values()):
+                    for queue in list(queues):
+                        self._close_queue(queue, error)
+
+    @staticmethod
+    def _close_queue(queue: asyncio.Queue, error: Optional[BaseException]):
+        # 异常结束时不能再等待，队列满则丢弃最旧的一帧为结束标记腾出空间
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(_StreamEnd(error))
+
+
+class FrameBroadcaster:
+    """
+    合并相同视频的播放请求
+
+    在合并窗口内请求同一视频（相同发送帧率）的会话共享一次解码，
+    各自以不同的画布尺寸接收帧。
+    """
+
+    def __init__(self, converter: VideoConverter, batch_window: float = 0.5):
+        """
+        :param converter: 视频转换器
+        :param batch_window: 合并窗口（秒），窗口内的请求共享一次解码
+        """
+        self.converter = converter
+        self.batch_window = batch_window
+        self._pending: Dict[Tuple[str, Optional[float]], FrameBroadcast] = {}
+
+    def subscribe(self, video_path: str, size: Size, fps: Optional[float] = None,
+                  source_fps: Optional[float] = None) -> AsyncGenerator[str, None]:
+        """
+        订阅视频帧流
+
+        订阅在调用时立即登记，返回的异步生成器需在结束后关闭以释放订阅。
+
+        :param video_path: 视频文件路径
+        :param size: 画布尺寸 (宽度, 高度)
+        :param fps: 发送帧率
+        :param source_fps: 源视频帧率，已知时传入以免解码前再次探测
+        :return: 盲文帧异步生成器
+        """
+        key = (os.path.realpath(video_path), fps)
+        broadcast = self._pending.get(key)
+        if broadcast is None:
+            broadcast = FrameBroadcast(self.converter, video_path, fps, source_fps=source_fps)
+            self._pending[key] = broadcast
+            asyncio.get_running_loop().call_later(self.batch_window, self._start, key, broadcast)
+
+        queue = broadcast.subscribe(size)
+        return self._consume(broadcast, size, queue)
+
+    def _start(self, key: Tuple[str, Optional[float]], broadcast: FrameBroadcast):
+        if self._pending.get(key) is broadcast:
+            del self._pending[key]
+        broadcast.start()
+
+    @staticmethod
+    async def _consume(broadcast: FrameBroadcast, size: Size,
+                       queue: asyncio.Queue) -> AsyncGenerator[str, None]:
+        try:
+            while True:
+                frame = await queue.get()
+                if isinstance(frame, _StreamEnd):
+                    if frame.error:
+                        raise frame.error
+                    return
+                yield frame
+        finally:
+            broadcast.unsubscribe(size, queue)
@@ -0,0 +1,270 @@
+import re
+import cv2
+import json
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+from typing import Dict, Optional, Tuple, Type
+
+# ffmpeg -i 输出中的视频流信息，如:
+#   Stream #0:0(und): Video: h264 (High), yuv420p, 1280x720 [SAR 1:1 DAR 16:9], 29.97 fps, 29.97 tbr, 30k tbn
+_VIDEO_STREAM_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Video: (.*)")
+_VIDEO_SIZE_PATTERN = re.compile(r"(?:^|, )(\d+)x(\d+)\b")
+_VIDEO_RATE_PATTERN = re.compile(r"(?:^|, )([\d.]+)(k?) (fps|tbr)\b")
+
+
+class FrameDecoder:
+    """
+    视频解码后端基类
+
+    每个实例对应一次打开的视频文件，按顺序逐帧返回图像。
+    """
+
+    name = ""
+
+    def __init__(self, video_path: str, width: int, height: int, fps: Optional[float] = None):
+        """
+        :param video_path: 视频文件路径
+        :param width: 目标画布宽度（像素）
+        :param height: 目标画布高度（像素）
+        :param fps: 目标帧率，为 None 时输出全部帧
+        """
+        self.video_path = video_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    @staticmethod
+    def probe(video_path: str) -> Tuple[float, int, int]:
+        """
+        获取视频信息
+
+        :param video_path: 视频文件路径
+        :return: (帧率, 宽度, 高度)
+        """
+        raise NotImplementedError
+
+    def read(self) -> Optional[np.ndarray]:
+        """
+        读取下一帧
+
+        返回的数组可能是后端内部复用的缓冲区，调用方需在读取下一帧前用完。
+
+        :return: BGR 或灰度图像，视频结束时返回 None
+        """
+        raise NotImplementedError
+
+    def release(self):
+        """
+        释放解码资源
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class OpenCVDecoder(FrameDecoder):
+    """
+    基于 cv2.VideoCapture 的默认解码后端
+    """
+
+    name = "opencv"
+
+    def __init__(self, video_path: str, width: int, height: int, fps: Optional[float] = None):
+        super().__init__(video_path, width, height, fps)
+        self._video = cv2.VideoCapture(video_path)
+        if not self._video.isOpened():
+            raise Exception("无法打开视频文件")
+
+        source_fps = self._video.get(cv2.CAP_PROP_FPS) or 0
+        # 按目标帧率抽帧：被跳过的帧只 grab 不 retrieve，省去像素格式转换
+        self._step = source_fps / fps if fps and source_fps > fps else 1.0
+        self._position = 0
+        self._next_pick = 0.0
+        self._frame = None
+
+    @staticmethod
+    def probe(video_path: str) -> Tuple[float, int, int]:
+        video = cv2.VideoCapture(video_path)
+        if not video.isOpened():
+            raise Exception("无法打开视频文件")
+
+        fps = video.get(cv2.CAP_PROP_FPS)
+        width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        video.release()
+
+        return fps, width, height
+
+    def read(self) -> Optional[np.ndarray]:
+        while True:
+            if not self._video.grab():
+                return None
+            position = self._position
+            self._position += 1
+            if position + 0.5 >= self._next_pick:
+                self._next_pick += self._step
+                # 解码到上一帧的数组中，避免每帧重新分配
+                ret, frame = self._video.retrieve(self._frame)
+                if not ret:
+                    return None
+                self._frame = frame
+                return frame
+
+    def release(self):
+        self._video.release()
+
+
+class FFmpegPipeDecoder(FrameDecoder):
+    """
+    基于 ffmpeg 子进程的解码后端
+
+    由 ffmpeg 在一次原生处理中完成缩放、抽帧和灰度转换，
+    通过管道输出目标尺寸的 gray rawvideo，并读入复用的 NumPy 缓冲区。
+    """
+
+    name = "ffmpeg"
+
+    def __init__(self, video_path: str, width: int, height: int, fps: Optional[float] = None):
+        super().__init__(video_path, width, height, fps)
+        executable = shutil.which("ffmpeg")
+        if not executable:
+            raise Exception("未找到 ffmpeg 可执行文件")
+
+        filters = []
+        if fps:
+            filters.append(f"fps={fps}")
+        filters.append(f"scale={width}:{height}:flags=area")
+        filters.append("format=gray")
+
+        # stderr 写入临时文件而非管道，避免输出过多时阻塞 ffmpeg；解码失败时读取末尾用于报错
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                executable, "-v", "error", "-nostdin",
+                "-i", video_path,
+                "-vf", ",".join(filters),
+                "-f", "rawvideo", "-pix_fmt", "gray",
+                "pipe:1"
+            ],
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            bufsize=0
+        )
+        self._buffer = np.empty((height, width), dtype=np.uint8)
+        self._view = memoryview(self._buffer).cast("B")
+
+    @staticmethod
+    def probe(video_path: str) -> Tuple[float, int, int]:
+        executable = shutil.which("ffprobe")
+        if not executable:
+            # 没有 ffprobe 时从 ffmpeg 打印的流信息中解析，只需 ffmpeg 一个可执行文件
+            return _probe_with_ffmpeg(video_path)
+
+        result = subprocess.run(
+            [
+                executable, "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate",
+                "-of", "json",
+                video_path
+            ],
+            capture_output=True
+        )
+        streams = json.loads(result.stdout or b"{}").get("streams") if result.returncode == 0 else None
+        if not streams:
+            raise Exception("无法打开视频文件")
+
+        stream = streams[0]
+        fps = _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+        return fps, int(stream.get("width", 0)), int(stream.get("height", 0))
+
+    def read(self) -> Optional[np.ndarray]:
+        stdout = self._process.stdout
+        total = len(self._view)
+        filled = 0
+        while filled < total:
+            count = stdout.readinto(self._view[filled:])
+            if not count:
+                self._check_exit()
+                return None
+            filled += count
+        return self._buffer
+
+    def _check_exit(self):
+        # 管道读完后确认 ffmpeg 正常退出，区分解码错误与视频结束
+        returncode = self._process.wait()
+        if returncode != 0:
+            self._stderr.seek(0, 2)
+            self._stderr.seek(max(0, self._stderr.tell() - 2048))
+            message = self._stderr.read().decode("utf-8", "replace").strip()
+            raise Exception(f"ffmpeg 解码失败 (退出码 {returncode}): {message or '无错误输出'}")
+
+    def release(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+        self._stderr.close()
+
+
+def _probe_with_ffmpeg(video_path: str) -> Tuple[float, int, int]:
+    """
+    通过 ffmpeg -i 的输出获取视频信息
+
+    :param video_path: 视频文件路径
+    :return: (帧率, 宽度, 高度)
+    """
+    executable = shutil.which("ffmpeg")
+    if not executable:
+        raise Exception("未找到 ffmpeg 可执行文件")
+
+    # 未指定输出文件时 ffmpeg 打印输入信息后以非零状态退出，这里只解析 stderr
+    result = subprocess.run([executable, "-hide_banner", "-nostdin", "-i", video_path], capture_output=True)
+    stream = _VIDEO_STREAM_PATTERN.search(result.stderr.decode("utf-8", "replace"))
+    size = _VIDEO_SIZE_PATTERN.search(stream.group(1)) if stream else None
+    if not size:
+        raise Exception("无法打开视频文件")
+
+    # 优先使用平均帧率 fps，缺失时退回 tbr
+    rates = {unit: float(value) * (1000 if scale else 1)
+             for value, scale, unit in _VIDEO_RATE_PATTERN.findall(stream.group(1))}
+    fps = rates.get("fps") or rates.get("tbr") or 0.0
+    return fps, int(size.group(1)), int(size.group(2))
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """
+    解析 ffprobe 输出的分数形式帧率
+
+    :param rate: 形如 "30000/1001" 的字符串
+    :return: 帧率，无法解析时返回 0
+    """
+    try:
+        numerator, _, denominator = (rate or "").partition("/")
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+DECODER_BACKENDS: Dict[str, Type[FrameDecoder]] = {
+    OpenCVDecoder.name: OpenCVDecoder,
+    FFmpegPipeDecoder.name: FFmpegPipeDecoder,
+}
+
+
+def get_decoder_backend(name: str) -> Type[FrameDecoder]:
+    """
+    根据名称获取解码后端
+
+    :param name: 后端名称
+    :return: 解码后端类
+    """
+    try:
+        return DECODER_BACKENDS[name]
+    except KeyError:
+        raise Exception(f"未知的解码后端: {name}，可选: {', '.join(DECODER_BACKENDS)}")
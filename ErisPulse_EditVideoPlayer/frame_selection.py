@@ -0,0 +1,92 @@
+import cv2
+import math
+import numpy as np
+from typing import Optional
+
+
+class SceneFrameSelector:
+    """
+    场景切换感知的关键帧选择
+
+    按目标帧率把源帧划分为等长区间，每个区间只输出一帧：
+    区间内出现场景切换时选择切换后的第一帧，否则选择最接近区间平均画面的一帧。
+    差异分数基于已缩小的灰度帧计算，开销很小。
+    """
+
+    def __init__(self, width: int, height: int, step: float, threshold: float = 30.0):
+        """
+        :param width: 灰度帧宽度
+        :param height: 灰度帧高度
+        :param step: 每个区间包含的源帧数（源帧率 / 目标帧率）
+        :param threshold: 判定为场景切换的平均像素差（0-255）
+        """
+        self.step = max(step, 1.0)
+        self.threshold = threshold
+
+        capacity = int(math.ceil(self.step)) + 1
+        self.frames = np.empty((capacity, height, width), dtype=np.uint8)
+        self.scores = np.zeros(capacity, dtype=np.float64)
+        self._previous = np.empty((height, width), dtype=np.uint8)
+        self._has_previous = False
+        self._sum = np.zeros((height, width), dtype=np.float32)
+        self._mean = np.empty((height, width), dtype=np.uint8)
+        self._count = 0
+        self._position = 0
+        self._boundary = self.step
+
+    def push(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        加入一帧灰度图像
+
+        返回的数组是内部缓冲区，需在下一次调用前用完。
+
+        :param frame: 已缩小的灰度帧
+        :return: 区间结束时返回选中的帧，否则返回 None
+        """
+        if self._has_previous:
+            score = cv2.norm(frame, self._previous, cv2.NORM_L1) / frame.size
+        else:
+            score = 0.0
+            self._has_previous = True
+        np.copyto(self._previous, frame)
+
+        np.copyto(self.frames[self._count], frame)
+        self.scores[self._count] = score
+        np.add(self._sum, frame, out=self._sum)
+        self._count += 1
+        self._position += 1
+
+        if self._position + 0.5 >= self._boundary or self._count == len(self.frames):
+            self._boundary += self.step
+            return self._select()
+        return None
+
+    def flush(self) -> Optional[np.ndarray]:
+        """
+        输出最后一个不完整区间的选中帧
+
+        :return: 选中的帧，没有剩余帧时返回 None
+        """
+        if not self._count:
+            return None
+        return self._select()
+
+    def _select(self) -> np.ndarray:
+        count = self._count
+        self._count = 0
+
+        scores = self.scores[:count]
+        cut = int(np.argmax(scores))
+        if scores[cut] >= self.threshold:
+            chosen = cut
+        else:
+            # 没有场景切换时选择最接近区间平均画面的一帧，避开过渡和运动模糊
+            np.multiply(self._sum, 1.0 / count, out=self._sum)
+            np.copyto(self._mean, self._sum, casting="unsafe")
+            chosen = min(
+                range(count),
+                key=lambda index: cv2.norm(self.frames[index], self._mean, cv2.NORM_L1)
+            )
+
+        self._sum.fill(0)
+        return self.frames[chosen]
@@ -0,0 +1,263 @@
+import os
+import uuid
+import struct
+import argparse
+import numpy as np
+from typing import Optional, Tuple
+
+from .decoders import FrameDecoder
+
+# 文件格式: 64 字节头 + 定长帧数组
+#   头: 魔数(8) 版本(H) 标志(H) 宽度(H) 高度(H) 帧率(d) 帧数(Q)，其余补零
+#   帧: 每帧 height 行，每行 width 字节灰度，或打包为 ceil(width / 8) 字节的 1 位点阵（1 表示暗部）
+FRAME_STORE_MAGIC = b"EVPFRAME"
+FRAME_STORE_VERSION = 1
+FRAME_STORE_EXT = ".evpf"
+HEADER_FORMAT = "<8sHHHHdQ"
+HEADER_SIZE = 64
+
+FLAG_PACKED = 1
+
+
+class FrameStore:
+    """
+    内存映射的灰度帧存储
+
+    帧以定长步幅顺序存放，通过 numpy.memmap 打开，按序号 O(1) 随机访问且不复制数据。
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 帧存储文件路径
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+        if len(header) < struct.calcsize(HEADER_FORMAT):
+            raise Exception("帧存储文件已损坏")
+
+        magic, version, flags, width, height, fps, count = struct.unpack(HEADER_FORMAT, header)
+        if magic != FRAME_STORE_MAGIC or version != FRAME_STORE_VERSION:
+            raise Exception("不支持的帧存储文件格式")
+
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.packed = bool(flags & FLAG_PACKED)
+        self.row_bytes = _row_bytes(width, self.packed)
+
+        if os.path.getsize(path) < HEADER_SIZE + count * height * self.row_bytes:
+            raise Exception("帧存储文件已损坏")
+
+        if count:
+            self.frames = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE,
+                                    shape=(count, height, self.row_bytes))
+        else:
+            self.frames = np.empty((0, height, self.row_bytes), dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """
+        获取指定帧（内存映射视图）
+
+        :param index: 帧序号
+        :return: 灰度帧，或打包的 1 位点阵
+        """
+        return self.frames[index]
+
+    def close(self):
+        """
+        释放对内存映射的引用
+
+        已返回的帧视图仍持有映射，映射在它们全部释放后才会关闭。
+        """
+        self.frames = None
+
+
+class FrameStoreDecoder(FrameDecoder):
+    """
+    从帧存储读取帧的解码后端
+
+    无需解码，抽帧和跳转都只是序号计算。灰度存储直接返回内存映射视图，
+    打包存储解包到复用的缓冲区中。
+    """
+
+    name = "framestore"
+
+    def __init__(self, video_path: str, width: int, height: int, fps: Optional[float] = None):
+        super().__init__(video_path, width, height, fps)
+        self._store = FrameStore(video_path)
+        self._step = self._store.fps / fps if fps and self._store.fps > fps else 1.0
+        self._position = 0.0
+
+        if self._store.packed:
+            # 按字节查表解包：每个字节对应 8 个像素，1 位为暗部（0），0 位为亮部（255）
+            bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+            self._lookup = np.where(bits == 1, 0, 255).astype(np.uint8)
+            self._unpacked = np.empty((self._store.height, self._store.row_bytes, 8), dtype=np.uint8)
+            self._grey = self._unpacked.reshape(self._store.height, -1)[:, :self._store.width]
+
+    @staticmethod
+    def probe(video_path: str) -> Tuple[float, int, int]:
+        store = FrameStore(video_path)
+        try:
+            return store.fps, store.width, store.height
+        finally:
+            store.close()
+
+    def seek(self, index: int):
+        """
+        跳转到指定帧
+
+        :param index: 帧序号
+        """
+        self._position = float(max(0, index))
+
+    def read(self) -> Optional[np.ndarray]:
+        index = int(self._position + 0.5)
+        if index >= len(self._store):
+            return None
+        self._position += self._step
+
+        frame = self._store[index]
+        if not self._store.packed:
+            return frame
+        np.take(self._lookup, frame, axis=0, out=self._unpacked)
+        return self._grey
+
+    def release(self):
+        self._store.close()
+
+
+def frame_store_path(video_dir: str, content_hash: str) -> str:
+    """
+    获取视频内容对应的帧存储路径
+
+    :param video_dir: 视频目录
+    :param content_hash: 视频内容哈希
+    :return: 帧存储文件路径
+    """
+    return os.path.join(video_dir, ".frames", content_hash + FRAME_STORE_EXT)
+
+
+def write_frame_store(converter, video_path: str, out_path: str, width: int, height: int,
+                      fps: Optional[float] = None, packed: bool = False) -> int:
+    """
+    将视频转换为帧存储
+
+    :param converter: VideoConverter 实例，使用其解码后端
+    :param video_path: 源视频路径
+    :param out_path: 输出文件路径
+    :param width: 帧宽度（像素）
+    :param height: 帧高度（像素）
+    :param fps: 存储帧率，为 None 时保留全部源帧
+    :param packed: 是否打包为 1 位点阵
+    :return: 写入的帧数
+    """
+    from .video_converter import FrameBuffers
+
+    source_fps = converter.get_video_info(video_path)[0]
+    store_fps = min(fps, source_fps) if fps and source_fps else (fps or source_fps)
+    buffers = FrameBuffers(width, height)
+    flags = FLAG_PACKED if packed else 0
+    count = 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    temp_path = f"{out_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as out_file, \
+                converter.decoder_backend(video_path, width, height, fps) as decoder:
+            out_file.write(_pack_header(flags, width, height, store_fps, 0))
+            while True:
+                frame = decoder.read()
+                if frame is None:
+                    break
+                small = converter._downscale_frame(frame, width, height, buffers)
+                if packed:
+                    converter._binarize(small, buffers)
+                    out_file.write(np.packbits(buffers.dots, axis=1).data)
+                else:
+                    out_file.write(np.ascontiguousarray(small).data)
+                count += 1
+
+            # 写完后回填帧数
+            out_file.seek(0)
+            out_file.write(_pack_header(flags, width, height, store_fps, count))
+        os.replace(temp_path, out_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return count
+
+
+def build_frame_stores(library, converter, width: int, height: int, fps: Optional[float] = None,
+                       packed: bool = False, force: bool = False):
+    """
+    为视频库中的所有视频生成帧存储
+
+    帧存储以内容哈希命名，别名和重复视频只生成一次。
+
+    :param library: VideoLibrary 实例
+    :param converter: VideoConverter 实例
+    :param width: 帧宽度（像素）
+    :param height: 帧高度（像素）
+    :param fps: 存储帧率，为 None 时保留全部源帧
+    :param packed: 是否打包为 1 位点阵
+    :param force: 是否覆盖已有的帧存储
+    :return: 生成结果列表 [(文件名, 帧存储路径, 帧数)]，已存在而跳过的帧数为 None
+    """
+    results = []
+    built = set()
+    for video in library.list_videos():
+        video_path = library.resolve(video["filename"])
+        if not video_path:
+            continue
+        out_path = frame_store_path(library.video_dir, library.content_hash(video_path))
+        if out_path in built or (os.path.exists(out_path) and not force):
+            results.append((video["filename"], out_path, None))
+            continue
+        count = write_frame_store(converter, video_path, out_path, width, height, fps, packed)
+        built.add(out_path)
+        results.append((video["filename"], out_path, count))
+    return results
+
+
+def _row_bytes(width: int, packed: bool) -> int:
+    return (width + 7) // 8 if packed else width
+
+
+def _pack_header(flags: int, width: int, height: int, fps: float, count: int) -> bytes:
+    header = struct.pack(HEADER_FORMAT, FRAME_STORE_MAGIC, FRAME_STORE_VERSION, flags,
+                         width, height, fps, count)
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def main():
+    from .library import VideoLibrary
+    from .video_converter import VideoConverter
+
+    parser = argparse.ArgumentParser(description="为视频目录中的视频生成内存映射帧存储")
+    parser.add_argument("video_dir", help="视频目录")
+    parser.add_argument("--width", type=int, default=100, help="帧宽度（像素）")
+    parser.add_argument("--height", type=int, default=50, help="帧高度（像素）")
+    parser.add_argument("--fps", type=float, default=None, help="存储帧率，默认保留全部源帧")
+    parser.add_argument("--packed", action="store_true", help="打包为 1 位点阵")
+    parser.add_argument("--decoder", default="opencv", help="解码后端")
+    parser.add_argument("--force", action="store_true", help="覆盖已有的帧存储")
+    args = parser.parse_args()
+
+    # 插件运行时独占索引的写入，这里只读，直接放入目录的视频每次重新计算哈希
+    library = VideoLibrary(args.video_dir, read_only=True)
+    converter = VideoConverter(decoder=args.decoder)
+    for filename, out_path, count in build_frame_stores(library, converter, args.width, args.height,
+                                                        args.fps, args.packed, args.force):
+        status = "已存在，跳过" if count is None else f"{count} 帧"
+        print(f"{filename} -> {out_path} ({status})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import aiofiles
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# 上传时每次读取的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+class VideoLibrary:
+    """
+    内容寻址的视频库
+
+    上传的视频按 SHA-256 内容哈希保存为 blob，索引把显示名映射到哈希。
+    相同内容只保存一份，以不同文件名上传的重复视频成为同一 blob 的别名。
+    视频目录中直接放入的文件仍可播放，其内容哈希按需计算并缓存。
+    """
+
+    BLOB_DIR = ".blobs"
+    INDEX_FILE = ".library.json"
+
+    def __init__(self, video_dir: str, read_only: bool = False,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        """
+        :param video_dir: 视频目录
+        :param read_only: 只读模式，不写入索引，供与插件并行运行的外部工具使用
+        :param on_remove: blob 被删除后的回调，参数为内容哈希，用于清理派生文件
+        """
+        self.video_dir = video_dir
+        self.read_only = read_only
+        self.on_remove = on_remove
+        self.blob_dir = os.path.join(video_dir, self.BLOB_DIR)
+        self.index_path = os.path.join(video_dir, self.INDEX_FILE)
+        if not read_only:
+            os.makedirs(self.blob_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        index = {"names": {}, "blobs": {}, "files": {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index.update(json.load(f))
+        return index
+
+    def _save_index(self):
+        if self.read_only:
+            return
+        # 先写临时文件再替换，避免写入中断损坏索引
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def blob_path(self, content_hash: str) -> str:
+        """
+        获取 blob 文件路径
+
+        :param content_hash: 内容哈希
+        :return: blob 文件路径
+        """
+        ext = self.index["blobs"].get(content_hash, {}).get("ext", "")
+        return os.path.join(self.blob_dir, content_hash + ext)
+
+    async def store(self, name: str, read: Callable[[int], Awaitable[bytes]],
+                    max_size: Optional[int] = None) -> Tuple[str, bool]:
+        """
+        流式保存视频，边写入边计算哈希
+
+        :param name: 显示名
+        :param read: 异步读取函数，参数为最大字节数，读完时返回空字节串
+        :param max_size: 最大允许字节数
+        :return: (内容哈希, 是否为重复内容)
+        """
+        ext = os.path.splitext(name)[1].lower()
+        temp_path = os.path.join(self.blob_dir, f".upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            async with aiofiles.open(temp_path, "wb") as out_file:
+                while True:
+                    chunk = await read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise Exception(f"文件大小超过限制，最大允许 {max_size // (1024*1024)}MB")
+                    digest.update(chunk)
+                    await out_file.write(chunk)
+
+            content_hash = digest.hexdigest()
+            duplicate = content_hash in self.index["blobs"] and os.path.exists(self.blob_path(content_hash))
+            if not duplicate:
+                # 与直接放入目录的视频内容相同时，把该文件收为 blob，原文件名成为别名
+                loose_path = await self._find_loose_copy(content_hash, size)
+                if loose_path:
+                    self._adopt_loose(loose_path, content_hash, size)
+                    duplicate = True
+            if duplicate:
+                os.remove(temp_path)
+            else:
+                self.index["blobs"][content_hash] = {"size": size, "ext": ext, "created": time.time()}
+                os.replace(temp_path, self.blob_path(content_hash))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        previous = self.index["names"].get(name)
+        self.index["names"][name] = content_hash
+        if previous and previous != content_hash:
+            self._remove_unreferenced(previous)
+        # 同名的直接放入目录的视频已被上传内容取代
+        self._remove_loose(name)
+        self._save_index()
+
+        return content_hash, duplicate
+
+    async def _find_loose_copy(self, content_hash: str, size: int) -> Optional[str]:
+        """
+        查找内容相同的直接放入目录的视频
+
+        只有大小相同的文件才需要比较哈希，未缓存的哈希在后台线程中计算。
+
+        :param content_hash: 内容哈希
+        :param size: 文件大小
+        :return: 文件路径，没有时返回 None
+        """
+        for file in os.listdir(self.video_dir):
+            if file in self.index["names"] or file.startswith(".") or not file.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            file_path = os.path.join(self.video_dir, file)
+            if not os.path.isfile(file_path) or os.path.getsize(file_path) != size:
+                continue
+            if await self.content_hash_async(file_path) == content_hash:
+                return file_path
+        return None
+
+    def _adopt_loose(self, file_path: str, content_hash: str, size: int):
+        name = os.path.basename(file_path)
+        ext = os.path.splitext(name)[1].lower()
+        self.index["blobs"][content_hash] = {"size": size, "ext": ext, "created": time.time()}
+        os.replace(file_path, self.blob_path(content_hash))
+        self.index["files"].pop(os.path.abspath(file_path), None)
+        self.index["names"][name] = content_hash
+
+    def _remove_loose(self, name: str):
+        file_path = os.path.join(self.video_dir, name)
+        if not os.path.isfile(file_path):
+            return
+        cached = self.index["files"].pop(os.path.abspath(file_path), None)
+        os.remove(file_path)
+        if cached and self.on_remove:
+            content_hash = cached["hash"]
+            referenced = content_hash in self.index["blobs"] or any(
+                entry["hash"] == content_hash for entry in self.index["files"].values()
+            )
+            if not referenced:
+                self.on_remove(content_hash)
+
+    def _remove_unreferenced(self, content_hash: str):
+        if content_hash in self.index["names"].values():
+            return
+        blob_path = self.blob_path(content_hash)
+        self.index["blobs"].pop(content_hash, None)
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
+        if self.on_remove:
+            self.on_remove(content_hash)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        根据显示名获取视频文件路径
+
+        :param name: 显示名
+        :return: 文件路径，不存在时返回 None
+        """
+        # 拒绝包含路径的名称，防止访问视频目录之外的文件
+        if not name or os.path.basename(name) != name or name.startswith("."):
+            return None
+
+        content_hash = self.index["names"].get(name)
+        if content_hash:
+            blob_path = self.blob_path(content_hash)
+            if os.path.exists(blob_path):
+                return blob_path
+
+        file_path = os.path.join(self.video_dir, name)
+        if os.path.isfile(file_path):
+            return file_path
+        return None
+
+    def content_hash(self, file_path: str) -> str:
+        """
+        计算文件的内容哈希
+
+        blob 直接返回其哈希；其他文件按 (大小, 修改时间) 缓存计算结果。
+        未缓存的文件需要完整读取，在事件循环中应使用 content_hash_async。
+
+        :param file_path: 文件路径
+        :return: 内容哈希
+        """
+        stat = os.stat(file_path)
+        content_hash = self._cached_hash(file_path, stat)
+        if content_hash is None:
+            content_hash = self._cache_hash(file_path, stat, _hash_file(file_path))
+        return content_hash
+
+    async def content_hash_async(self, file_path: str) -> str:
+        """
+        计算文件的内容哈希，未缓存时在后台线程中读取文件
+
+        :param file_path: 文件路径
+        :return: 内容哈希
+        """
+        stat = os.stat(file_path)
+        content_hash = self._cached_hash(file_path, stat)
+        if content_hash is None:
+            content_hash = self._cache_hash(file_path, stat, await asyncio.to_thread(_hash_file, file_path))
+        return content_hash
+
+    def _cached_hash(self, file_path: str, stat: os.stat_result) -> Optional[str]:
+        if os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(self.blob_dir):
+            return os.path.splitext(os.path.basename(file_path))[0]
+        cached = self.index["files"].get(os.path.abspath(file_path))
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+            return cached["hash"]
+        return None
+
+    def _cache_hash(self, file_path: str, stat: os.stat_result, content_hash: str) -> str:
+        self.index["files"][os.path.abspath(file_path)] = {
+            "size": stat.st_size, "mtime": stat.st_mtime, "hash": content_hash
+        }
+        self._save_index()
+        return content_hash
+
+    def list_videos(self) -> List[Dict[str, Any]]:
+        """
+        获取视频列表
+
+        :return: 视频信息列表
+        """
+        videos = []
+        for name, content_hash in self.index["names"].items():
+            blob_path = self.blob_path(content_hash)
+            if not os.path.exists(blob_path):
+                continue
+            stat = os.stat(blob_path)
+            videos.append({
+                "filename": name,
+                "size": stat.st_size,
+                "modified": stat.st_mtime,
+                "hash": content_hash
+            })
+
+        if os.path.exists(self.video_dir):
+            for file in os.listdir(self.video_dir):
+                if file in self.index["names"] or file.startswith("."):
+                    continue
+                if file.lower().endswith(VIDEO_EXTENSIONS):
+                    file_path = os.path.join(self.video_dir, file)
+                    stat = os.stat(file_path)
+                    videos.append({
+                        "filename": file,
+                        "size": stat.st_size,
+                        "modified": stat.st_mtime
+                    })
+        return videos
+
+    def verify(self, full: bool = False) -> List[str]:
+        """
+        校验 blob 完整性
+
+        :param full: 是否重新计算哈希，否则只校验文件存在和大小
+        :return: 损坏或缺失的内容哈希列表
+        """
+        damaged = []
+        for content_hash, info in self.index["blobs"].items():
+            blob_path = self.blob_path(content_hash)
+            if not os.path.exists(blob_path) or os.path.getsize(blob_path) != info.get("size"):
+                damaged.append(content_hash)
+                continue
+            if full and _hash_file(blob_path) != content_hash:
+                damaged.append(content_hash)
+        return damaged
+
+
+def _hash_file(file_path: str) -> str:
+    """
+    分块计算文件的 SHA-256
+
+    :param file_path: 文件路径
+    :return: 十六进制哈希
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
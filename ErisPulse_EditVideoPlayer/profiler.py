@@ -0,0 +1,199 @@
+import sys
+import time
+import asyncio
+import cProfile
+import numpy as np
+from typing import Any, Dict, Optional, Set
+
+# 播放热路径的各个阶段
+STAGES = ("read", "convert", "encode", "edit")
+
+STAGE_NAMES = {
+    "read": "解码读取",
+    "convert": "灰度/缩放/二值化",
+    "encode": "盲文编码",
+    "edit": "消息编辑",
+}
+
+# 消息编辑结果
+EDIT_OUTCOMES = ("ok", "failed", "rate_limited")
+
+EDIT_OUTCOME_NAMES = {
+    "ok": "成功",
+    "failed": "失败",
+    "rate_limited": "限流",
+}
+
+# 同一时间只能有一个 cProfile 在运行。Python 3.12 之前启用第二个 Profile 不会报错，
+# 而是替换掉前一个，停止时也会一并停止另一个，因此由模块统一记录占用者
+_cprofile_owner: Optional["PlaybackProfiler"] = None
+
+
+class PlaybackProfiler:
+    """
+    单次播放会话的分阶段耗时记录
+
+    每个阶段的耗时（perf_counter_ns 差值）写入固定大小的环形缓冲区，
+    播放结束后统计 p50/p95/p99。可选同时用 cProfile 采样整个会话。
+    """
+
+    def __init__(self, capacity: int = 1024, cprofile_path: Optional[str] = None):
+        """
+        :param capacity: 每个阶段保留的最近样本数
+        :param cprofile_path: pstats 输出路径，为 None 时不启用 cProfile
+        """
+        self.capacity = max(1, capacity)
+        self.cprofile_path = cprofile_path
+        self._samples = {stage: np.zeros(self.capacity, dtype=np.int64) for stage in STAGES}
+        self._counts = dict.fromkeys(STAGES, 0)
+        self._cprofile: Optional[cProfile.Profile] = None
+        self.cprofile_skipped = False
+        self.edit_outcomes = dict.fromkeys(EDIT_OUTCOMES, 0)
+        self._pending_edits: Set[asyncio.Future] = set()
+
+    def record(self, stage: str, elapsed_ns: int):
+        """
+        记录一次阶段耗时
+
+        :param stage: 阶段名称
+        :param elapsed_ns: 耗时（纳秒）
+        """
+        count = self._counts[stage]
+        self._samples[stage][count % self.capacity] = elapsed_ns
+        self._counts[stage] = count + 1
+
+    def track_edit(self, result: Any, started_ns: int):
+        """
+        记录一次消息编辑
+
+        适配器返回 Task 时在其完成后计时，只有成功的编辑计入 edit 阶段耗时，
+        失败和限流单独计数。
+
+        :param result: 适配器 Edit 的返回值
+        :param started_ns: 调用 Edit 前的 perf_counter_ns
+        """
+        if isinstance(result, asyncio.Future):
+            self._pending_edits.add(result)
+            result.add_done_callback(lambda future: self._finish_edit(future, started_ns))
+        else:
+            self._count_edit(result, time.perf_counter_ns() - started_ns)
+
+    def _finish_edit(self, future: asyncio.Future, started_ns: int):
+        elapsed_ns = time.perf_counter_ns() - started_ns
+        self._pending_edits.discard(future)
+        if future.cancelled() or future.exception() is not None:
+            self.edit_outcomes["failed"] += 1
+            return
+        self._count_edit(future.result(), elapsed_ns)
+
+    def _count_edit(self, response: Any, elapsed_ns: int):
+        outcome = _edit_outcome(response)
+        self.edit_outcomes[outcome] += 1
+        if outcome == "ok":
+            self.record("edit", elapsed_ns)
+
+    async def wait_pending(self, timeout: float = 5.0):
+        """
+        等待尚未完成的编辑，使报告包含最后几帧
+
+        :param timeout: 最长等待时间（秒）
+        """
+        if self._pending_edits:
+            await asyncio.wait(set(self._pending_edits), timeout=timeout)
+
+    def start(self) -> bool:
+        """
+        启动 cProfile（如已配置）
+
+        cProfile 采样的是整个线程，同一事件循环中的其他协程也会被计入。
+        已有其他会话或分析器在运行时跳过，并设置 cprofile_skipped。
+
+        :return: 是否成功启动
+        """
+        global _cprofile_owner
+        if not self.cprofile_path or self._cprofile:
+            return False
+        if _cprofile_owner is not None or sys.getprofile() is not None:
+            self.cprofile_skipped = True
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ 检测到其他分析器在运行
+            self.cprofile_skipped = True
+            return False
+        self._cprofile = profile
+        _cprofile_owner = self
+        return True
+
+    def stop(self) -> Optional[str]:
+        """
+        停止 cProfile 并写出 pstats 文件
+
+        :return: pstats 文件路径，未启用时返回 None
+        """
+        global _cprofile_owner
+        if not self._cprofile:
+            return None
+        profile, self._cprofile = self._cprofile, None
+        profile.disable()
+        if _cprofile_owner is self:
+            _cprofile_owner = None
+        profile.dump_stats(self.cprofile_path)
+        return self.cprofile_path
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        统计各阶段耗时分位数
+
+        :return: {阶段: {"count": 样本总数, "p50": 毫秒, "p95": 毫秒, "p99": 毫秒}}
+        """
+        result = {}
+        for stage in STAGES:
+            count = self._counts[stage]
+            if not count:
+                continue
+            samples = self._samples[stage][:min(count, self.capacity)]
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99)) / 1e6
+            result[stage] = {"count": count, "p50": p50, "p95": p95, "p99": p99}
+        return result
+
+    def format_report(self) -> str:
+        """
+        生成可读的耗时报告
+
+        :return: 报告文本
+        """
+        summary = self.summary()
+        if not summary and not any(self.edit_outcomes.values()):
+            return "没有采集到性能数据"
+
+        lines = ["各阶段耗时 (ms) p50 / p95 / p99:"]
+        for stage, stats in summary.items():
+            lines.append(
+                f"  {STAGE_NAMES[stage]}: {stats['p50']:.2f} / {stats['p95']:.2f} / {stats['p99']:.2f}"
+                f" ({stats['count']} 次)"
+            )
+        if any(self.edit_outcomes.values()):
+            lines.append("消息编辑结果: " + ", ".join(
+                f"{EDIT_OUTCOME_NAMES[outcome]} {count}" for outcome, count in self.edit_outcomes.items()
+            ))
+        return "\n".join(lines)
+
+
+def _edit_outcome(response: Any) -> str:
+    """
+    根据适配器响应判断编辑结果
+
+    :param response: 适配器响应
+    :return: ok / failed / rate_limited
+    """
+    if not isinstance(response, dict):
+        return "ok"
+    retcode = response.get("retcode", response.get("code", 0))
+    if retcode == 429 or response.get("status") == "rate_limited":
+        return "rate_limited"
+    if response.get("status") == "failed" or retcode not in (0, 200, None):
+        return "failed"
+    return "ok"
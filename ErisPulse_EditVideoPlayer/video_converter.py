@@ -1,145 +1,277 @@
 import cv2
+import time
 import asyncio
 import numpy as np
-from typing import AsyncGenerator, Tuple
+from typing import AsyncGenerator, Dict, List, Optional, Tuple, Type, Union
+from .decoders import FrameDecoder, get_decoder_backend
+from .frame_selection import SceneFrameSelector
+from .frame_store import FRAME_STORE_EXT, FrameStoreDecoder
+from .profiler import PlaybackProfiler
+
+# 盲文点位与位权重 (行偏移, 列偏移, 权重)
+# 位置: 1 4
+#      2 5
+#      3 6
+#      7 8
+BRAILLE_DOTS = (
+    (0, 0, 1), (1, 0, 2), (2, 0, 4), (3, 0, 64),
+    (0, 1, 8), (1, 1, 16), (2, 1, 32), (3, 1, 128),
+)
+
+BRAILLE_BASE = 0x2800
+
+
+class FrameBuffers:
+    """
+    单个会话、单个画布尺寸下复用的帧缓冲区
+
+    灰度、缩放、二值化结果和输出码位数组只在创建时分配一次，
+    稳态下每帧只产生最终的输出字符串。
+    """
+
+    def __init__(self, width: int, height: int):
+        """
+        :param width: 画布宽度（像素）
+        :param height: 画布高度（像素）
+        """
+        self.width = width
+        self.height = height
+        self.grey = None
+        self.small = np.empty((height, width), dtype=np.uint8)
+        # 二值化结果：1 表示该点位需要点亮
+        self.dots = np.empty((height, width), dtype=np.uint8)
+
+        # 不足 2x4 的边缘像素直接舍弃
+        rows, cols = height // 4, width // 2
+        self.codes = np.empty((rows, cols + 1), dtype="<u4")
+        self.codes[:, cols] = ord("\n")
+        self._cells = self.codes[:, :cols]
+        self._bits = np.empty((rows, cols), dtype=np.uint8)
+        self._weighted = np.empty((rows, cols), dtype=np.uint8)
+        self._base = np.uint32(BRAILLE_BASE)
+        self._dot_views = [
+            (self.dots[dy:rows * 4:4, dx:cols * 2:2], np.uint8(weight))
+            for dy, dx, weight in BRAILLE_DOTS
+        ]
+        # 去掉最后一行的换行符
+        self._text = memoryview(self.codes.reshape(-1)[:-1]) if rows and cols else None
+
+    def grey_for(self, frame: np.ndarray) -> np.ndarray:
+        """
+        获取与源帧尺寸匹配的灰度缓冲区
+
+        :param frame: 源帧
+        :return: 灰度缓冲区
+        """
+        if self.grey is None or self.grey.shape != frame.shape[:2]:
+            self.grey = np.empty(frame.shape[:2], dtype=np.uint8)
+        return self.grey
+
+    def encode(self) -> str:
+        """
+        将 dots 缓冲区编码为盲文字符串
+
+        :return: 盲文字符串
+        """
+        if self._text is None:
+            return ""
+
+        bits = self._bits
+        bits.fill(0)
+        for view, weight in self._dot_views:
+            np.multiply(view, weight, out=self._weighted)
+            np.bitwise_or(bits, self._weighted, out=bits)
+        np.add(bits, self._base, out=self._cells)
+
+        return str(self._text, "utf-32-le")
+
+
+# 抽帧方式
+FRAME_SELECTIONS = ("uniform", "scene")
+
 
 class VideoConverter:
-    def __init__(self, width: int = 60, height: int = 30):
+    def __init__(self, width: int = 60, height: int = 30,
+                 decoder: Union[str, Type[FrameDecoder]] = "opencv",
+                 frame_selection: str = "uniform", scene_threshold: float = 30.0):
         self.width = width
         self.height = height
-        self.braille_chars = np.array([
-            '⠀', '⠁', '⠂', '⠃', '⠄', '⠅', '⠆', '⠇',
-            '⠈', '⠉', '⠊', '⠋', '⠌', '⠍', '⠎', '⠏',
-            '⠐', '⠑', '⠒', '⠓', '⠔', '⠕', '⠖', '⠗',
-            '⠘', '⠙', '⠚', '⠛', '⠜', '⠝', '⠞', '⠟',
-            '⠠', '⠡', '⠢', '⠣', '⠤', '⠥', '⠦', '⠧',
-            '⠨', '⠩', '⠪', '⠫', '⠬', '⠭', '⠮', '⠯',
-            '⠰', '⠱', '⠲', '⠳', '⠴', '⠵', '⠶', '⠷',
-            '⠸', '⠹', '⠺', '⠻', '⠼', '⠽', '⠾', '⠿',
-            '⡀', '⡁', '⡂', '⡃', '⡄', '⡅', '⡆', '⡇',
-            '⡈', '⡉', '⡊', '⡋', '⡌', '⡍', '⡎', '⡏',
-            '⡐', '⡑', '⡒', '⡓', '⡔', '⡕', '⡖', '⡗',
-            '⡘', '⡙', '⡚', '⡛', '⡜', '⡝', '⡞', '⡟',
-            '⡠', '⡡', '⡢', '⡣', '⡤', '⡥', '⡦', '⡧',
-            '⡨', '⡩', '⡪', '⡫', '⡬', '⡭', '⡮', '⡯',
-            '⡰', '⡱', '⡲', '⡳', '⡴', '⡵', '⡶', '⡷',
-            '⡸', '⡹', '⡺', '⡻', '⡼', '⡽', '⡾', '⡿',
-            '⢀', '⢁', '⢂', '⢃', '⢄', '⢅', '⢆', '⢇',
-            '⢈', '⢉', '⢊', '⢋', '⢌', '⢍', '⢎', '⢏',
-            '⢐', '⢑', '⢒', '⢓', '⢔', '⢕', '⢖', '⢗',
-            '⢘', '⢙', '⢚', '⢛', '⢜', '⢝', '⢞', '⢟',
-            '⢠', '⢡', '⢢', '⢣', '⢤', '⢥', '⢦', '⢧',
-            '⢨', '⢩', '⢪', '⢫', '⢬', '⢭', '⢮', '⢯',
-            '⢰', '⢱', '⢲', '⢳', '⢴', '⢵', '⢶', '⢷',
-            '⢸', '⢹', '⢺', '⢻', '⢼', '⢽', '⢾', '⢿',
-            '⣀', '⣁', '⣂', '⣃', '⣄', '⣅', '⣆', '⣇',
-            '⣈', '⣉', '⣊', '⣋', '⣌', '⣍', '⣎', '⣏',
-            '⣐', '⣑', '⣒', '⣓', '⣔', '⣕', '⣖', '⣗',
-            '⣘', '⣙', '⣚', '⣛', '⣜', '⣝', '⣞', '⣟',
-            '⣠', '⣡', '⣢', '⣣', '⣤', '⣥', '⣦', '⣧',
-            '⣨', '⣩', '⣪', '⣫', '⣬', '⣭', '⣮', '⣯',
-            '⣰', '⣱', '⣲', '⣳', '⣴', '⣵', '⣶', '⣷',
-            '⣸', '⣹', '⣺', '⣻', '⣼', '⣽', '⣾', '⣿'
-        ])
+        self.decoder = decoder
+        # uniform: 等间隔抽帧；scene: 按区间优先选择场景切换后的帧
+        self.frame_selection = frame_selection
+        self.scene_threshold = scene_threshold
+
+    @property
+    def decoder_backend(self) -> Type[FrameDecoder]:
+        if isinstance(self.decoder, str):
+            return get_decoder_backend(self.decoder)
+        return self.decoder
+
+    def _decoder_for(self, video_path: str) -> Type[FrameDecoder]:
+        # 帧存储文件无需解码，直接使用内存映射读取
+        if video_path.endswith(FRAME_STORE_EXT):
+            return FrameStoreDecoder
+        return self.decoder_backend
 
     def get_video_info(self, video_path: str) -> Tuple[float, int, int]:
-        video = cv2.VideoCapture(video_path)
-        if not video.isOpened():
-            raise Exception("无法打开视频文件")
-        
-        fps = video.get(cv2.CAP_PROP_FPS)
-        width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        video.release()
-        
-        return fps, width, height
-
-    async def convert_video_to_braille(self, video_path: str) -> AsyncGenerator[str, None]:
-        video = cv2.VideoCapture(video_path)
-
-        if not video.isOpened():
-            raise Exception("无法打开视频文件")
+        return self._decoder_for(video_path).probe(video_path)
+
+    async def convert_video_to_braille(self, video_path: str, width: Optional[int] = None,
+                                       height: Optional[int] = None,
+                                       fps: Optional[float] = None,
+                                       profiler: Optional[PlaybackProfiler] = None,
+                                       source_fps: Optional[float] = None) -> AsyncGenerator[str, None]:
+        size = (width or self.width, height or self.height)
 
+        frames = self.convert_video_to_braille_multi(video_path, [size], fps, profiler, source_fps)
         try:
+            async for rendered in frames:
+                yield rendered[size]
+        finally:
+            await frames.aclose()
+
+    async def convert_video_to_braille_multi(
+        self, video_path: str, sizes: List[Tuple[int, int]], fps: Optional[float] = None,
+        profiler: Optional[PlaybackProfiler] = None, source_fps: Optional[float] = None
+    ) -> AsyncGenerator[Dict[Tuple[int, int], str], None]:
+        """
+        一次解码同时渲染多个画布尺寸
+
+        源帧只缩放一次到能覆盖所有尺寸的最大画布，其余尺寸再由它缩小得到。
+        frame_selection 为 scene 且需要抽帧时，解码全部源帧，由 SceneFrameSelector 在每个区间内选帧。
+
+        :param video_path: 视频文件路径
+        :param sizes: 画布尺寸列表 [(宽度, 高度), ...]
+        :param fps: 目标帧率，为 None 时输出全部帧
+        :param profiler: 分阶段耗时记录器，为 None 时不计时
+        :param source_fps: 源视频帧率，调用方已获取时传入以免重复探测
+        :return: 每帧 {(宽度, 高度): 盲文字符串}
+        """
+        sizes = list(dict.fromkeys(sizes))
+        if not sizes:
+            return
+
+        canvas = (max(w for w, _ in sizes), max(h for _, h in sizes))
+        canvas_buffers = FrameBuffers(*canvas)
+        size_buffers = {size: FrameBuffers(*size) for size in sizes}
+
+        selector = None
+        if fps and self.frame_selection == "scene":
+            if source_fps is None:
+                # 探测可能启动子进程，不在事件循环中执行
+                source_fps = (await asyncio.to_thread(self.get_video_info, video_path))[0]
+            if source_fps > fps:
+                selector = SceneFrameSelector(canvas[0], canvas[1], source_fps / fps, self.scene_threshold)
+        elif self.frame_selection not in FRAME_SELECTIONS:
+            raise Exception(f"未知的抽帧方式: {self.frame_selection}，可选: {', '.join(FRAME_SELECTIONS)}")
+
+        decode_fps = None if selector else fps
+        with self._decoder_for(video_path)(video_path, canvas[0], canvas[1], decode_fps) as decoder:
             while True:
-                ret, frame = video.read()
-                if not ret:
-                    break
+                if profiler is not None:
+                    started = time.perf_counter_ns()
+                frame = decoder.read()
+                if profiler is not None:
+                    profiler.record("read", time.perf_counter_ns() - started)
+
+                try:
+                    if selector is not None:
+                        # 区间未结束时继续解码，视频结束时输出最后一个区间
+                        if frame is None:
+                            frame = selector.flush()
+                        else:
+                            frame = selector.push(
+                                self._downscale_frame(frame, canvas[0], canvas[1], canvas_buffers)
+                            )
+                            if frame is None:
+                                # 跳过的帧同样需要让出事件循环，否则高帧率源会长时间占用循环
+                                await asyncio.sleep(0)
+                                continue
+                    if frame is None:
+                        break
 
-                braille_frame = self._image_to_braille(frame)
-                yield braille_frame
+                    rendered = self._render_sizes(frame, canvas, canvas_buffers, size_buffers, profiler)
+                except Exception as e:
+                    rendered = {size: f"图像转换失败: {str(e)}" for size in sizes}
+                yield rendered
 
                 # 允许其他协程运行
                 await asyncio.sleep(0)
-        finally:
-            video.release()
 
-    def _image_to_braille(self, frame: np.ndarray) -> str:
-        try:
-            # 转换为灰度图
-            if len(frame.shape) == 3:
-                grey_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            else:
-                grey_frame = frame
+    def _render_sizes(self, frame: np.ndarray, canvas: Tuple[int, int], canvas_buffers: FrameBuffers,
+                      size_buffers: Dict[Tuple[int, int], FrameBuffers],
+                      profiler: Optional[PlaybackProfiler] = None) -> Dict[Tuple[int, int], str]:
+        rendered = {}
+        if profiler is None:
+            canvas_frame = self._downscale_frame(frame, canvas[0], canvas[1], canvas_buffers)
+            for size, buffers in size_buffers.items():
+                rendered[size] = self._small_to_braille(
+                    self._downscale_frame(canvas_frame, size[0], size[1], buffers), buffers
+                )
+            return rendered
 
-            # 调整大小
-            small_grey_frame = cv2.resize(grey_frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        convert_ns = 0
+        encode_ns = 0
+        started = time.perf_counter_ns()
+        canvas_frame = self._downscale_frame(frame, canvas[0], canvas[1], canvas_buffers)
+        for size, buffers in size_buffers.items():
+            self._binarize(self._downscale_frame(canvas_frame, size[0], size[1], buffers), buffers)
+            encoding = time.perf_counter_ns()
+            rendered[size] = buffers.encode()
+            finished = time.perf_counter_ns()
+            convert_ns += encoding - started
+            encode_ns += finished - encoding
+            started = finished
+        profiler.record("convert", convert_ns)
+        profiler.record("encode", encode_ns)
+        return rendered
 
-            # 二值化处理
-            _, binary_frame = cv2.threshold(small_grey_frame, 127, 255, cv2.THRESH_BINARY)
+    def _image_to_braille(self, frame: np.ndarray, width: Optional[int] = None,
+                          height: Optional[int] = None,
+                          buffers: Optional[FrameBuffers] = None) -> str:
+        try:
+            width = width or self.width
+            height = height or self.height
+            if buffers is None:
+                buffers = FrameBuffers(width, height)
 
-            return self._binary_image_to_braille(binary_frame)
+            small_grey_frame = self._downscale_frame(frame, width, height, buffers)
+            return self._small_to_braille(small_grey_frame, buffers)
         except Exception as e:
             return f"图像转换失败: {str(e)}"
 
-    def _binary_image_to_braille(self, image: np.ndarray) -> str:
+    def _downscale_frame(self, frame: np.ndarray, width: int, height: int,
+                         buffers: FrameBuffers) -> np.ndarray:
+        # 转换为灰度图
+        if len(frame.shape) == 3:
+            grey_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers.grey_for(frame))
+        else:
+            grey_frame = frame
+
+        # 调整大小（已是目标尺寸时跳过）
+        if grey_frame.shape == (height, width):
+            return grey_frame
+        return cv2.resize(grey_frame, (width, height), dst=buffers.small,
+                          interpolation=cv2.INTER_AREA)
+
+    def _small_to_braille(self, small_grey_frame: np.ndarray, buffers: FrameBuffers) -> str:
+        self._binarize(small_grey_frame, buffers)
+        return buffers.encode()
+
+    def _binarize(self, small_grey_frame: np.ndarray, buffers: FrameBuffers):
+        # 二值化处理：暗部像素记为 1
+        cv2.threshold(small_grey_frame, 127, 1, cv2.THRESH_BINARY_INV, dst=buffers.dots)
+
+    def _binary_image_to_braille(self, image: np.ndarray,
+                                 buffers: Optional[FrameBuffers] = None) -> str:
         try:
             height, width = image.shape
-            
-            # 确保尺寸是合适的倍数
-            if width % 2 != 0 or height % 4 != 0:
-                new_width = (width // 2) * 2
-                new_height = (height // 4) * 4
-                image = image[:new_height, :new_width]
-                height, width = image.shape
-
-            # 预分配输出字符串
-            output_lines = []
-            
-            # 向量化处理提高效率
-            for y in range(0, height, 4):
-                line_chars = []
-                for x in range(0, width, 2):
-                    # 构造8位二进制数表示一个盲文字符
-                    # 位置: 1 4
-                    #      2 5
-                    #      3 6
-                    #      7 8
-                    bits = 0
-                    
-                    # 检查8个点位
-                    if y < height and x < width and image[y, x] == 0:          # 位置1
-                        bits |= 1
-                    if y + 1 < height and x < width and image[y + 1, x] == 0:    # 位置2
-                        bits |= 2
-                    if y + 2 < height and x < width and image[y + 2, x] == 0:    # 位置3
-                        bits |= 4
-                    if y + 3 < height and x < width and image[y + 3, x] == 0:    # 位置7
-                        bits |= 64
-                    if y < height and x + 1 < width and image[y, x + 1] == 0:    # 位置4
-                        bits |= 8
-                    if y + 1 < height and x + 1 < width and image[y + 1, x + 1] == 0:  # 位置5
-                        bits |= 16
-                    if y + 2 < height and x + 1 < width and image[y + 2, x + 1] == 0:  # 位置6
-                        bits |= 32
-                    if y + 3 < height and x + 1 < width and image[y + 3, x + 1] == 0:  # 位置8
-                        bits |= 128
-
-                    # 添加字符
-                    line_chars.append(self.braille_chars[bits])
-
-                output_lines.append(''.join(line_chars))
-
-            return '\n'.join(output_lines)
+            if buffers is None:
+                buffers = FrameBuffers(width, height)
+
+            # 黑色像素（0）对应点亮的点位
+            np.equal(image, 0, out=buffers.dots.view(np.bool_))
+
+            return buffers.encode()
         except Exception as e:
-            return f"盲文转换失败: {str(e)}"
\ No newline at end of file
+            return f"盲文转换失败: {str(e)}"
@@ -0,0 +1,104 @@
+"""
+帧转换内存分配基准
+
+使用 tracemalloc 统计 _image_to_braille 稳态下每帧的内存分配，
+对比复用 FrameBuffers 与每帧新建缓冲区两种方式。
+
+用法:
+    python benchmarks/bench_frame_alloc.py [视频文件] [--width 60] [--height 30] [--frames 300]
+
+未指定视频文件时使用随机生成的 720p BGR 帧。
+"""
+import argparse
+import asyncio
+import gc
+import tracemalloc
+
+import numpy as np
+
+from ErisPulse_EditVideoPlayer.video_converter import FrameBuffers, VideoConverter
+
+
+def measure(run_frame, frames: int, warmup: int = 10):
+    """
+    测量每帧平均分配字节数与峰值
+
+    :param run_frame: 处理单帧的函数，返回值在下一帧前保持存活
+    :param frames: 测量帧数
+    :param warmup: 预热帧数
+    :return: (每帧平均临时分配字节数, 测量期间峰值字节数)
+    """
+    for _ in range(warmup):
+        run_frame()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        allocated = 0
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            result = run_frame()
+            _, peak = tracemalloc.get_traced_memory()
+            allocated += peak - before
+            del result
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return allocated / frames, peak - baseline
+
+
+def bench_synthetic(converter: VideoConverter, width: int, height: int, frames: int):
+    frame = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    buffers = FrameBuffers(width, height)
+
+    reused = measure(lambda: converter._image_to_braille(frame, width, height, buffers), frames)
+    fresh = measure(lambda: converter._image_to_braille(frame, width, height), frames)
+    return reused, fresh
+
+
+def bench_video(converter: VideoConverter, video_path: str, width: int, height: int, frames: int):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        iterator = converter.convert_video_to_braille(video_path, width, height).__aiter__()
+
+        def run_frame():
+            return loop.run_until_complete(iterator.__anext__())
+
+        result = measure(run_frame, frames)
+        loop.run_until_complete(iterator.aclose())
+        return result
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帧转换内存分配基准")
+    parser.add_argument("video", nargs="?", help="视频文件路径")
+    parser.add_argument("--width", type=int, default=60)
+    parser.add_argument("--height", type=int, default=30)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--decoder", default="opencv")
+    args = parser.parse_args()
+
+    converter = VideoConverter(args.width, args.height, decoder=args.decoder)
+    output_size = (args.height // 4) * (args.width // 2 + 1) * 2
+
+    if args.video:
+        per_frame, peak = bench_video(converter, args.video, args.width, args.height, args.frames)
+        print(f"视频解码+转换: 每帧分配 {per_frame:.0f} 字节, 峰值 {peak} 字节")
+    else:
+        (reused, reused_peak), (fresh, fresh_peak) = bench_synthetic(
+            converter, args.width, args.height, args.frames
+        )
+        print(f"复用缓冲区:   每帧分配 {reused:.0f} 字节, 峰值 {reused_peak} 字节")
+        print(f"每帧新建缓冲: 每帧分配 {fresh:.0f} 字节, 峰值 {fresh_peak} 字节")
+
+    print(f"输出字符串约 {output_size} 字节")
+
+
+if __name__ == "__main__":
+    main()
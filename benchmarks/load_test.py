@@ -0,0 +1,176 @@
+"""
+播放压测工具
+
+使用 MockAdapter 替代真实平台，同时通过 /video 命令（_handle_video_command）和
+HTTP /play 路由发起多个播放会话，统计编辑吞吐量、事件循环延迟和内存占用。
+需在安装了 ErisPulse 的环境中运行，视频需已存在于配置的 video_directory 中。
+
+用法:
+    python benchmarks/load_test.py <视频文件名> [--sessions 20] [--http-sessions 0]
+                                   [--width 60] [--height 30] [--stagger 0]
+                                   [--latency 0.05] [--jitter 0.02]
+                                   [--error-rate 0] [--rate-limit 每秒次数]
+                                   [--trace-malloc]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import resource
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_adapter import MockAdapter  # noqa: E402
+from ErisPulse_EditVideoPlayer import Main  # noqa: E402
+
+MOCK_PLATFORM = "mock"
+
+
+class _AdapterProxy:
+    """
+    优先返回模拟适配器，其余属性转发给真实的适配器管理器
+    """
+
+    def __init__(self, adapter_manager, mocks):
+        self._adapter_manager = adapter_manager
+        self._mocks = mocks
+
+    def get(self, platform):
+        if platform in self._mocks:
+            return self._mocks[platform]
+        return self._adapter_manager.get(platform)
+
+    def __getattr__(self, name):
+        return getattr(self._adapter_manager, name)
+
+
+class _SdkProxy:
+    """
+    替换 adapter 的 sdk 代理
+    """
+
+    def __init__(self, sdk, mocks):
+        self._sdk = sdk
+        self.adapter = _AdapterProxy(sdk.adapter, mocks)
+
+    def __getattr__(self, name):
+        return getattr(self._sdk, name)
+
+
+async def monitor_loop_lag(samples, interval: float = 0.05):
+    """
+    记录事件循环延迟：实际唤醒时间与预期的差值
+
+    :param samples: 存放延迟（秒）的列表
+    :param interval: 采样间隔（秒）
+    """
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+def percentiles(values):
+    if not values:
+        return "-"
+    p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000
+    return f"{p50:.1f} / {p95:.1f} / {p99:.1f} ms"
+
+
+async def run(args):
+    adapter = MockAdapter(args.latency, args.jitter, args.error_rate, args.rate_limit, args.seed)
+    player = Main()
+    player.sdk = _SdkProxy(player.sdk, {MOCK_PLATFORM: adapter})
+
+    lag_samples = []
+    monitor = asyncio.create_task(monitor_loop_lag(lag_samples))
+    baseline_tasks = asyncio.all_tasks()
+
+    if args.trace_malloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+
+    request = SimpleNamespace(client=SimpleNamespace(host="127.0.0.1"))
+    play_route = player.http_handlers["/play"]
+
+    for index in range(args.sessions):
+        await player._handle_video_command({
+            "platform": MOCK_PLATFORM,
+            "detail_type": "group",
+            "group_id": f"group-{index}",
+            "user_id": f"user-{index}",
+            "alt_message": f'/video play "{args.video}" {args.width} {args.height}'
+        })
+        if args.stagger:
+            await asyncio.sleep(args.stagger)
+
+    for index in range(args.http_sessions):
+        result = await play_route(request, args.video, MOCK_PLATFORM, "user", f"http-{index}",
+                                  args.width, args.height, api_key_valid=True)
+        if result.get("status") != "success":
+            print(f"HTTP /play 失败: {result.get('message')}")
+        if args.stagger:
+            await asyncio.sleep(args.stagger)
+
+    # 等待所有播放任务（及其派生任务）结束
+    while True:
+        pending = asyncio.all_tasks() - baseline_tasks - {asyncio.current_task()}
+        if not pending:
+            break
+        await asyncio.wait(pending, timeout=args.timeout)
+        if time.perf_counter() - started > args.timeout:
+            print(f"超时，仍有 {len(pending)} 个任务未完成")
+            break
+
+    elapsed = time.perf_counter() - started
+    if args.trace_malloc:
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    monitor.cancel()
+
+    edits = adapter.edits
+    statuses = {}
+    for record in edits:
+        statuses[record.status] = statuses.get(record.status, 0) + 1
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"会话数: {args.sessions} (命令) + {args.http_sessions} (HTTP)")
+    print(f"总耗时: {elapsed:.2f} s")
+    print(f"编辑调用: {len(edits)} 次, 吞吐量 {len(edits) / elapsed:.1f} 次/s")
+    print("编辑结果: " + ", ".join(f"{status} {count}" for status, count in sorted(statuses.items())))
+    print(f"模拟延迟 p50/p95/p99: {percentiles([record.latency for record in edits])}")
+    print(f"事件循环延迟 p50/p95/p99: {percentiles(lag_samples)}, 最大 "
+          f"{max(lag_samples, default=0) * 1000:.1f} ms")
+    if args.trace_malloc:
+        print(f"Python 内存峰值 (tracemalloc): {traced_peak / 1024 / 1024:.1f} MB")
+    print(f"进程最大常驻内存: {max_rss_mb:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="播放压测工具")
+    parser.add_argument("video", help="视频文件名或序号")
+    parser.add_argument("--sessions", type=int, default=20, help="通过 /video 命令发起的会话数")
+    parser.add_argument("--http-sessions", type=int, default=0, help="通过 HTTP /play 发起的会话数")
+    parser.add_argument("--width", type=int, default=60)
+    parser.add_argument("--height", type=int, default=30)
+    parser.add_argument("--stagger", type=float, default=0.0, help="会话之间的启动间隔（秒）")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟平均响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02, help="模拟延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟错误率")
+    parser.add_argument("--rate-limit", type=float, default=None, help="每个目标每秒允许的调用次数")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="启用 tracemalloc 统计 Python 内存峰值（会明显拖慢运行）")
+    parser.add_argument("--timeout", type=float, default=600.0, help="最长等待时间（秒）")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+支持消息编辑的本地模拟适配器
+
+实现 Send.To(...).Text/Edit，可配置延迟、抖动、错误率和频率限制，并记录每一次调用。
+与真实适配器一样，Text/Edit 返回 asyncio.Task，调用方可选择是否等待结果。
+"""
+import time
+import random
+import asyncio
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+
+@dataclass
+class CallRecord:
+    """
+    一次适配器调用的记录
+    """
+    kind: str               # "text" 或 "edit"
+    target: str             # "<目标类型>:<目标ID>"
+    message_id: str
+    length: int
+    status: str             # "ok" / "error" / "rate_limited"
+    sent_at: float          # 调用时间 (perf_counter)
+    latency: float          # 模拟的响应耗时（秒）
+
+
+class MockAdapter:
+    """
+    模拟适配器
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, seed: Optional[int] = None):
+        """
+        :param latency: 平均响应延迟（秒）
+        :param jitter: 延迟的随机抖动范围（秒）
+        :param error_rate: 调用失败的概率
+        :param rate_limit: 每个目标每秒允许的调用次数，为 None 时不限制
+        :param seed: 随机数种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.records: List[CallRecord] = []
+        self.messages: Dict[str, str] = {}
+        self._message_seq = 0
+        self._recent_calls: Dict[str, Deque[float]] = defaultdict(deque)
+        self.Send = _MockSend(self)
+
+    @property
+    def edits(self) -> List[CallRecord]:
+        return [record for record in self.records if record.kind == "edit"]
+
+    def _check_rate_limit(self, target: str, now: float) -> bool:
+        if not self.rate_limit:
+            return True
+        calls = self._recent_calls[target]
+        while calls and now - calls[0] >= 1.0:
+            calls.popleft()
+        if len(calls) >= self.rate_limit:
+            return False
+        calls.append(now)
+        return True
+
+    async def _call(self, kind: str, target: str, message_id: Optional[str], text: str) -> Dict[str, Any]:
+        sent_at = time.perf_counter()
+        latency = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+        if not self._check_rate_limit(target, sent_at):
+            status = "rate_limited"
+        elif self.random.random() < self.error_rate:
+            status = "error"
+        else:
+            status = "ok"
+
+        if kind == "text" and status == "ok":
+            self._message_seq += 1
+            message_id = str(self._message_seq)
+
+        self.records.append(CallRecord(kind, target, message_id or "", len(text), status, sent_at, latency))
+        await asyncio.sleep(latency)
+
+        if status == "rate_limited":
+            return {"status": "failed", "retcode": 429, "message": "rate limited"}
+        if status == "error":
+            return {"status": "failed", "retcode": 500, "message": "mock error"}
+
+        self.messages[message_id] = text
+        return {"status": "ok", "retcode": 0, "data": {"message_id": message_id}}
+
+
+class _MockSend:
+    """
+    模拟发送器，To() 返回绑定目标的新发送器
+    """
+
+    def __init__(self, adapter: MockAdapter, target: Optional[str] = None):
+        self._adapter = adapter
+        self._target = target
+
+    def To(self, target_type: str, target_id: str) -> "_MockSend":
+        return _MockSend(self._adapter, f"{target_type}:{target_id}")
+
+    def Text(self, text: str) -> asyncio.Task:
+        return asyncio.create_task(self._adapter._call("text", self._target, None, text))
+
+    def Edit(self, message_id: str, text: str) -> asyncio.Task:
+        return asyncio.create_task(self._adapter._call("edit", self._target, str(message_id), text))